@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.db.models import Count
+from django.conf import settings
+
+MAX_REPORTED_DUPLICATES = 10
+
+
+def check_duplicate_rows(apps, schema_editor):
+    '''
+    Fails if there are duplicate rows that would prevent adding the unique constraints in
+    0003_unique_together. Before those constraints, concurrent launches could create the same
+    resource or course user twice. Duplicates are not removed automatically because rows in
+    other applications (and each duplicate's course) may refer to them, so they must be
+    merged by hand as described in the README.
+    '''
+    LTIResource = apps.get_model('django_app_lti', 'LTIResource')
+    LTICourseUser = apps.get_model('django_app_lti', 'LTICourseUser')
+
+    resources = list(LTIResource.objects.order_by().values('consumer_key', 'resource_link_id')
+        .annotate(count=Count('id')).filter(count__gt=1)[:MAX_REPORTED_DUPLICATES])
+    course_users = list(LTICourseUser.objects.order_by().values('user', 'course')
+        .annotate(count=Count('id')).filter(count__gt=1)[:MAX_REPORTED_DUPLICATES])
+    if not (resources or course_users):
+        return
+
+    lines = ["Duplicate LTI rows must be merged before the unique constraints can be added "
+             "(see \"Upgrading\" in the django-app-lti README)."]
+    for resource in resources:
+        lines.append("  LTIResource consumer_key=%(consumer_key)r resource_link_id=%(resource_link_id)r: %(count)d rows" % resource)
+    for course_user in course_users:
+        lines.append("  LTICourseUser user=%(user)r course=%(course)r: %(count)d rows" % course_user)
+    raise Exception("\n".join(lines))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('django_app_lti', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_rows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+from django.conf import settings
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('django_app_lti', '0002_check_duplicate_rows'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='lticourseuser',
+            unique_together=set([('user', 'course')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='ltiresource',
+            unique_together=set([('consumer_key', 'resource_link_id')]),
+        ),
+    ]
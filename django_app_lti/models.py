@@ -1,6 +1,17 @@
 from builtins import object
-from django.db import models
+import hashlib
+import logging
+import time
+from django.db import IntegrityError, models, transaction
 from django.conf import settings
+from django.core.cache import cache
+
+# Concurrent launches for a new resource (e.g. a whole class clicking the tool link
+# at once) are serialized with a cache lock so that only one of them sets it up.
+SETUP_LOCK_TIMEOUT = 10
+SETUP_LOCK_POLL_INTERVAL = 0.1
+
+logger = logging.getLogger(__name__)
 
 class LTICourse(models.Model):
     course_name_short = models.CharField(max_length=1024)
@@ -11,10 +22,10 @@ class LTICourse(models.Model):
     @classmethod
     def getCourseNames(cls, course_id):
         result = {"name": "", "name_short": ""}
-        if cls.objects.filter(id=course_id).exists():
-            c = cls.objects.get(id=course_id)
-            result['name'] = c.course_name
-            result['name_short'] = c.course_name_short
+        c = cls.objects.filter(id=course_id).values('course_name', 'course_name_short').first()
+        if c is not None:
+            result['name'] = c['course_name']
+            result['name_short'] = c['course_name_short']
         return result
     
     def __unicode__(self):
@@ -38,20 +49,24 @@ class LTICourseUser(models.Model):
  
     @classmethod
     def getCourseUser(cls, user, course):
-        result = cls.objects.filter(user=user, course=course)
-        if len(result) > 0:
-            return result[0]
-        return None
+        return cls.objects.select_related('user', 'course').filter(user=user, course=course).first()
    
     @classmethod
     def createCourseUser(cls, user, course, roles=''):
         course_user = cls.objects.create(user=user, course=course, roles=roles)
         return course_user
+
+    @classmethod
+    def getOrCreateCourseUser(cls, user_id, course_id, roles=''):
+        course_user, created = cls.objects.get_or_create(user_id=user_id, course_id=course_id, defaults={'roles': roles})
+        if not created:
+            course_user.updateRoles(roles)
+        return course_user
     
     def updateRoles(self, roles):
         if self.roles != roles:
             self.roles = roles
-            self.save()
+            self.save(update_fields=['roles', 'updated'])
             return True
         return False
 
@@ -62,6 +77,7 @@ class LTICourseUser(models.Model):
         verbose_name = 'LTI Course Users'
         verbose_name_plural = 'LTI Course Users '
         ordering = ['course','user', 'roles']
+        unique_together = (('user', 'course'),)
 
 class LTIResource(models.Model):
     consumer_key = models.CharField(max_length=255, blank=False)
@@ -78,10 +94,62 @@ class LTIResource(models.Model):
     
     @classmethod
     def getResource(cls, consumer_key, resource_link_id):
-        result = cls.objects.filter(consumer_key=consumer_key,resource_link_id=resource_link_id)
-        if len(result) > 0:
-            return result[0]
-        return None
+        return cls.objects.select_related('course').filter(consumer_key=consumer_key,resource_link_id=resource_link_id).first()
+
+    @classmethod
+    def getOrSetupResource(cls, launch, create_course=False):
+        consumer_key, resource_link_id = launch.get('consumer_key'), launch.get('resource_link_id')
+        resource = cls.getResource(consumer_key, resource_link_id)
+        if resource is not None:
+            return resource
+
+        # The lock is only an optimization: if the cache is unavailable (e.g. Redis is down),
+        # set up without it, since the unique constraint still prevents duplicate resources.
+        lock_key = cls._setupLockKey(consumer_key, resource_link_id)
+        try:
+            locked = cache.add(lock_key, 1, SETUP_LOCK_TIMEOUT)
+        except Exception:
+            logger.warning("Unable to acquire LTI resource setup lock; continuing without it", exc_info=True)
+            return cls._setupOrGetResource(launch, create_course)
+
+        if not locked:
+            # Another launch is setting up this resource, so wait for it to finish.
+            deadline = time.monotonic() + SETUP_LOCK_TIMEOUT
+            try:
+                while cache.get(lock_key) is not None and time.monotonic() < deadline:
+                    time.sleep(SETUP_LOCK_POLL_INTERVAL)
+            except Exception:
+                logger.warning("Unable to check LTI resource setup lock; continuing without it", exc_info=True)
+            resource = cls.getResource(consumer_key, resource_link_id)
+            if resource is not None:
+                return resource
+            return cls._setupOrGetResource(launch, create_course)
+
+        try:
+            return cls._setupOrGetResource(launch, create_course)
+        finally:
+            try:
+                cache.delete(lock_key)
+            except Exception:
+                logger.warning("Unable to release LTI resource setup lock", exc_info=True)
+
+    @classmethod
+    def _setupOrGetResource(cls, launch, create_course=False):
+        # The unique constraint on (consumer_key, resource_link_id) guards against a
+        # concurrent launch that set up the resource anyway (e.g. after the lock expired).
+        try:
+            with transaction.atomic():
+                return cls.setupResource(launch, create_course)
+        except IntegrityError:
+            resource = cls.getResource(launch.get('consumer_key'), launch.get('resource_link_id'))
+            if resource is None:
+                raise
+            return resource
+
+    @classmethod
+    def _setupLockKey(cls, consumer_key, resource_link_id):
+        digest = hashlib.sha256(("%s:%s" % (consumer_key, resource_link_id)).encode('utf-8')).hexdigest()
+        return 'lti:setup:%s' % digest
     
     @classmethod
     def setupResource(cls, launch, create_course=False):
@@ -103,3 +171,4 @@ class LTIResource(models.Model):
         verbose_name = 'LTI Resource'
         verbose_name_plural = 'LTI Resources'
         ordering = ['consumer_key','resource_link_id', 'context_id']
+        unique_together = (('consumer_key', 'resource_link_id'),)
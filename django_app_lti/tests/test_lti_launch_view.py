@@ -1,6 +1,7 @@
 import unittest
-from braces.views import LoginRequiredMixin
+from django.contrib.auth.models import AnonymousUser
 from django.views.generic import RedirectView
+from django.test import RequestFactory
 
 from django_app_lti.views import LTILaunchView
 
@@ -14,4 +15,34 @@ class LTILaunchViewTest(unittest.TestCase):
         """
         Test that the launch view requires users to log in
         """
-        self.assertIsInstance(self.view, LoginRequiredMixin, 'LTI launch view expected to be a subclass of LoginRequiredMixin')
+        request = RequestFactory().post('/lti/launch')
+        request.user = AnonymousUser()
+        response = LTILaunchView.as_view()(request)
+        self.assertEqual(response.status_code, 302, 'LTI launch view expected to redirect anonymous users to log in')
+
+    def test_view_login_attributes(self):
+        """
+        Test that subclasses can customize the login redirect with the LoginRequiredMixin attributes
+        """
+        class CustomLTILaunchView(LTILaunchView):
+            login_url = '/custom-login'
+            redirect_field_name = 'return_to'
+
+        request = RequestFactory().post('/lti/launch')
+        request.user = AnonymousUser()
+        response = CustomLTILaunchView.as_view()(request)
+        self.assertEqual(response.url, '/custom-login?return_to=/lti/launch')
+
+    def test_view_csrf_exempt(self):
+        """
+        Test that the launch view is exempt from CSRF checks since launches are POSTed by the consumer
+        """
+        self.assertTrue(getattr(LTILaunchView.as_view(), 'csrf_exempt', False))
+
+    def test_get_not_allowed(self):
+        """
+        Test that the launch view rejects GET requests since launches must be POSTed
+        """
+        response = self.view.get(RequestFactory().get('/lti/launch'))
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response['Allow'], 'POST')
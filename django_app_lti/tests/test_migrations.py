@@ -0,0 +1,46 @@
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TransactionTestCase
+
+class RemoveDuplicateRowsMigrationTest(TransactionTestCase):
+    migrate_from = [('django_app_lti', '0001_initial')]
+    migrate_to = [('django_app_lti', '0003_unique_together')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_duplicate_resources_fail_migration(self):
+        apps = self.migrate(self.migrate_from)
+        LTIResource = apps.get_model('django_app_lti', 'LTIResource')
+        LTIResource.objects.create(consumer_key="key", resource_link_id="abc", context_id="b")
+        LTIResource.objects.create(consumer_key="key", resource_link_id="abc", context_id="a")
+
+        with self.assertRaisesRegex(Exception, "LTIResource consumer_key='key' resource_link_id='abc': 2 rows"):
+            self.migrate(self.migrate_to)
+        self.assertEqual(LTIResource.objects.count(), 2)
+
+        LTIResource.objects.filter(context_id="b").delete()
+        self.migrate(self.migrate_to)
+
+    def test_duplicate_course_users_fail_migration(self):
+        apps = self.migrate(self.migrate_from)
+        User = apps.get_model('auth', 'User')
+        LTICourse = apps.get_model('django_app_lti', 'LTICourse')
+        LTICourseUser = apps.get_model('django_app_lti', 'LTICourseUser')
+        course = LTICourse.objects.create(course_name_short="CS50", course_name="Intro")
+        user = User.objects.create(username="student")
+        LTICourseUser.objects.create(user=user, course=course, roles="Instructor")
+        stale_user = LTICourseUser.objects.create(user=user, course=course, roles="Learner")
+
+        with self.assertRaisesRegex(Exception, "LTICourseUser user=%r course=%r: 2 rows" % (user.pk, course.pk)):
+            self.migrate(self.migrate_to)
+        self.assertEqual(LTICourseUser.objects.count(), 2)
+
+        stale_user.delete()
+        self.migrate(self.migrate_to)
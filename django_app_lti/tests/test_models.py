@@ -0,0 +1,85 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from mock import patch
+
+from django_app_lti.models import LTIResource, LTICourse, LTICourseUser
+
+class LTIResourceTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def launch(self):
+        return {
+            "consumer_key": "mykey",
+            "resource_link_id": "abc123",
+            "context_id": "ctx",
+            "course_name_short": "CS50",
+            "course_name": "Introduction to Computer Science",
+            "canvas_course_id": "1",
+        }
+
+    def test_get_or_setup_resource_creates_once(self):
+        created = LTIResource.getOrSetupResource(self.launch(), create_course=True)
+        self.assertIsNotNone(created.course)
+        self.assertEqual(created.course.course_name_short, "CS50")
+
+        with self.assertNumQueries(1):
+            found = LTIResource.getOrSetupResource(self.launch(), create_course=True)
+            self.assertEqual(found.course.id, created.course.id)
+        self.assertEqual(found.pk, created.pk)
+        self.assertEqual(LTIResource.objects.count(), 1)
+        self.assertEqual(LTICourse.objects.count(), 1)
+
+    def test_get_or_setup_resource_waits_for_concurrent_setup(self):
+        launch = self.launch()
+        lock_key = LTIResource._setupLockKey(launch["consumer_key"], launch["resource_link_id"])
+        cache.add(lock_key, 1)
+
+        def finish_concurrent_setup(seconds):
+            LTIResource.setupResource(self.launch())
+            cache.delete(lock_key)
+
+        with patch("django_app_lti.models.time.sleep", side_effect=finish_concurrent_setup) as sleep:
+            found = LTIResource.getOrSetupResource(launch)
+        self.assertEqual(sleep.call_count, 1)
+        self.assertEqual(LTIResource.objects.count(), 1)
+        self.assertEqual(found.pk, LTIResource.objects.get().pk)
+
+    def test_get_or_setup_resource_handles_duplicate_setup(self):
+        existing = LTIResource.setupResource(self.launch(), create_course=True)
+        with patch.object(LTIResource, "getResource", side_effect=[None, existing]):
+            found = LTIResource.getOrSetupResource(self.launch(), create_course=True)
+        self.assertEqual(found.pk, existing.pk)
+        self.assertEqual(LTIResource.objects.count(), 1)
+        self.assertEqual(LTICourse.objects.count(), 1)
+
+    def test_get_or_setup_resource_without_cache(self):
+        with patch("django_app_lti.models.cache.add", side_effect=ConnectionError):
+            with self.assertLogs("django_app_lti.models", level="WARNING"):
+                created = LTIResource.getOrSetupResource(self.launch(), create_course=True)
+        self.assertEqual(LTIResource.objects.get().pk, created.pk)
+
+class LTICourseUserTest(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create(username="student")
+        self.course = LTICourse.objects.create(course_name_short="CS50", course_name="Intro")
+
+    def test_get_or_create_course_user_updates_roles(self):
+        course_user = LTICourseUser.getOrCreateCourseUser(user_id=self.user.id, course_id=self.course.id, roles="Learner")
+        self.assertEqual(course_user.roles, "Learner")
+
+        course_user = LTICourseUser.getOrCreateCourseUser(user_id=self.user.id, course_id=self.course.id, roles="Instructor")
+        self.assertEqual(course_user.roles, "Instructor")
+        self.assertEqual(LTICourseUser.objects.filter(user=self.user, course=self.course).count(), 1)
+
+        with self.assertNumQueries(1):
+            LTICourseUser.getOrCreateCourseUser(user_id=self.user.id, course_id=self.course.id, roles="Instructor")
+
+class LTICourseTest(TestCase):
+    def test_get_course_names(self):
+        course = LTICourse.objects.create(course_name_short="CS50", course_name="Intro")
+        with self.assertNumQueries(1):
+            result = LTICourse.getCourseNames(course.id)
+        self.assertEqual(result, {"name": "Intro", "name_short": "CS50"})
+        self.assertEqual(LTICourse.getCourseNames(course.id + 1), {"name": "", "name_short": ""})
@@ -1,15 +1,18 @@
 import django
 from django.conf import settings
+from django.core.cache import cache
 from django.urls import reverse, resolve
 from django.test import TestCase, RequestFactory
-from mock import Mock
+from mock import Mock, patch
 from lti import ToolConfig
 
+from django_app_lti.tool_config import render_extensions, render_tool_config
 from django_app_lti.views import LTIToolConfigView
 
 class ToolConfigViewTest(TestCase):
     def setUp(self):
         django.setup()
+        cache.clear()
         self.view = LTIToolConfigView()
         self.view.request = RequestFactory().get('/lti/config')
         self.view.request.session = {}
@@ -24,6 +27,17 @@ class ToolConfigViewTest(TestCase):
 
         self.assertEqual(actual, expected)
 
+    def test_launch_url_uses_canonical_host(self):
+        self.view.request.get_host = Mock(return_value="localhost")
+        self.view.request.is_secure = Mock(return_value=False)
+
+        with patch("django_app_lti.views.LTI_SETUP.CANONICAL_HOST", "https://tool.example.edu"):
+            actual = self.view.get_launch_url(self.view.request)
+        expected = 'https://tool.example.edu' + reverse(self.view.LAUNCH_URL)
+
+        self.assertEqual(actual, expected)
+        self.view.request.get_host.assert_not_called()
+
     def test_url_excludes_resource_link_id(self):
         test_urls = (
             'https://example.com/lti/launch?resource_link_id=None',
@@ -50,3 +64,72 @@ class ToolConfigViewTest(TestCase):
         self.assertEqual(actual.title, expected.title)
         self.assertEqual(actual.launch_url, expected.launch_url)
         self.assertEqual(actual.secure_launch_url, expected.secure_launch_url)
+
+    def test_tool_config_xml_is_cached(self):
+        self.view.request.get_host = Mock(return_value="localhost")
+        self.view.request.is_secure = Mock(return_value=True)
+        self.view.get_tool_config_xml = Mock(return_value=b"<xml/>")
+
+        first = self.view.get(self.view.request)
+        second = self.view.get(self.view.request)
+
+        self.assertEqual(first.content, b"<xml/>")
+        self.assertEqual(second.content, b"<xml/>")
+        self.assertEqual(self.view.get_tool_config_xml.call_count, 1)
+
+    def test_tool_config_xml_cached_per_view_class(self):
+        class FirstToolConfigView(LTIToolConfigView):
+            def set_ext_params(self, lti_tool_config):
+                lti_tool_config.set_ext_param("canvas.instructure.com", "privacy_level", "public")
+
+        class SecondToolConfigView(LTIToolConfigView):
+            def set_ext_params(self, lti_tool_config):
+                lti_tool_config.set_ext_param("canvas.instructure.com", "privacy_level", "anonymous")
+
+        request = RequestFactory().get('/lti/config')
+        request.get_host = Mock(return_value="localhost")
+        request.is_secure = Mock(return_value=True)
+
+        first = FirstToolConfigView().get(request)
+        second = SecondToolConfigView().get(request)
+
+        self.assertIn(b">public<", first.content)
+        self.assertIn(b">anonymous<", second.content)
+
+    def test_tool_config_cache_key_varies_by_script_prefix_and_urlconf(self):
+        self.view.request.get_host = Mock(return_value="localhost")
+        self.view.request.is_secure = Mock(return_value=True)
+        key = self.view.get_cache_key(self.view.request)
+
+        with patch("django_app_lti.views.get_script_prefix", return_value="/mount/"):
+            self.assertNotEqual(self.view.get_cache_key(self.view.request), key)
+
+        self.view.request.urlconf = "other.urls"
+        self.assertNotEqual(self.view.get_cache_key(self.view.request), key)
+
+    def test_render_tool_config_matches_tool_config_xml(self):
+        launch_url = "https://foo.bar/lti/launch?a=1&b=2"
+        ext_params = {
+            "canvas.instructure.com": {
+                "privacy_level": "public",
+                "course_navigation": {
+                    "enabled": "true",
+                    "text": "My <tool> & co\r\n",
+                    'quoted "name"\t': "value",
+                },
+            },
+        }
+        for title, description in (("Title & more", "Description"), ("Title", None)):
+            expected = ToolConfig(
+                title=title,
+                description=description,
+                launch_url=launch_url,
+                secure_launch_url=launch_url,
+            )
+            for ext_key, ext_params_for_key in ext_params.items():
+                for ext_param, ext_value in ext_params_for_key.items():
+                    expected.set_ext_param(ext_key, ext_param, ext_value)
+
+            actual = render_tool_config(title, description, launch_url, render_extensions(ext_params))
+
+            self.assertEqual(actual, expected.to_xml())
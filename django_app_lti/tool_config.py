@@ -0,0 +1,78 @@
+from string import Template
+from xml.sax.saxutils import escape
+
+# Mirrors the output of lti.ToolConfig.to_xml() for the subset of options used by
+# LTIToolConfigView, so the XML can be produced without building an lxml tree.
+TOOL_CONFIG_TEMPLATE = Template(
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<cartridge_basiclti_link'
+    ' xmlns:blti="http://www.imsglobal.org/xsd/imsbasiclti_v1p0"'
+    ' xmlns:lticm="http://www.imsglobal.org/xsd/imslticm_v1p0"'
+    ' xmlns:lticp="http://www.imsglobal.org/xsd/imslticp_v1p0"'
+    ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+    ' xsi:schemaLocation="'
+    'http://www.imsglobal.org/xsd/imslticc_v1p0 http://www.imsglobal.org/xsd/lti/ltiv1p0/imslticc_v1p0.xsd'
+    ' http://www.imsglobal.org/xsd/imsbasiclti_v1p0 http://www.imsglobal.org/xsd/lti/ltiv1p0/imsbasiclti_v1p0p1.xsd'
+    ' http://www.imsglobal.org/xsd/imslticm_v1p0 http://www.imsglobal.org/xsd/lti/ltiv1p0/imslticm_v1p0.xsd'
+    ' http://www.imsglobal.org/xsd/imslticp_v1p0 http://www.imsglobal.org/xsd/lti/ltiv1p0/imslticp_v1p0.xsd"'
+    ' xmlns="http://www.imsglobal.org/xsd/imslticc_v1p0">'
+    '$title'
+    '$description'
+    '$launch_url'
+    '$secure_launch_url'
+    '<blti:vendor/>'
+    '$extensions'
+    '</cartridge_basiclti_link>'
+)
+
+# Entities used by lxml when serializing text and attribute values.
+TEXT_ENTITIES = {'\r': '&#13;'}
+ATTRIBUTE_ENTITIES = {'"': '&quot;', '\r': '&#13;', '\n': '&#10;', '\t': '&#9;'}
+
+def escape_attribute(value):
+    return escape(value, ATTRIBUTE_ENTITIES)
+
+def render_element(tag, text, name=None):
+    '''
+    Returns an element with escaped text and an optional name attribute. Like lxml,
+    the element is self-closing when the text is None.
+    '''
+    start = tag if name is None else '%s name="%s"' % (tag, escape_attribute(name))
+    if text is None:
+        return '<%s/>' % start
+    return '<%s>%s</%s>' % (start, escape(text, TEXT_ENTITIES), tag)
+
+def render_extension_options(params):
+    '''
+    Returns the lticm:options/lticm:property elements for a (possibly nested)
+    dict of extension parameters, sorted by name like ToolConfig.to_xml().
+    '''
+    xml = []
+    for name, value in sorted(params.items()):
+        if isinstance(value, dict):
+            xml.append('<lticm:options name="%s">%s</lticm:options>' % (escape_attribute(name), render_extension_options(value)))
+        else:
+            xml.append(render_element('lticm:property', value, name=name))
+    return ''.join(xml)
+
+def render_extensions(extension_parameters):
+    '''
+    Returns the blti:extensions elements for each platform in the extension parameters.
+    '''
+    return ''.join(
+        '<blti:extensions platform="%s">%s</blti:extensions>' % (escape_attribute(platform), render_extension_options(params))
+        for platform, params in sorted(extension_parameters.items())
+    )
+
+def render_tool_config(title, description, launch_url, extensions=''):
+    '''
+    Returns the tool configuration XML as bytes. The extensions argument is the
+    output of render_extensions().
+    '''
+    return TOOL_CONFIG_TEMPLATE.substitute(
+        title=render_element('blti:title', title),
+        description=render_element('blti:description', description),
+        launch_url=render_element('blti:launch_url', launch_url),
+        secure_launch_url=render_element('blti:secure_launch_url', launch_url),
+        extensions=extensions,
+    ).encode('utf-8')
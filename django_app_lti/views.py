@@ -1,25 +1,57 @@
 from future import standard_library
 standard_library.install_aliases()
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseNotAllowed
 from django.shortcuts import redirect
-from django.urls import reverse
+from django.urls import get_script_prefix, reverse
 from django.contrib.auth import logout
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import View
 from django.conf import settings
+from django.core.cache import cache
 
+from types import SimpleNamespace
 from urllib.parse import parse_qs, urlparse, urlencode, urlunparse
 
 from lti import ToolConfig
-from braces.views import CsrfExemptMixin, LoginRequiredMixin
 
 from .models import LTIResource, LTICourse, LTICourseUser
+from .tool_config import render_extensions, render_tool_config
 
-LTI_SETUP = settings.LTI_SETUP
-INITIALIZE_MODELS = LTI_SETUP.get('INITIALIZE_MODELS', False)
+# LTI_SETUP is exposed as a namespace (e.g. LTI_SETUP.TOOL_TITLE) with defaults for optional settings.
+LTI_SETUP_DEFAULTS = {
+    "INITIALIZE_MODELS": False,
+    "LAUNCH_URL": "lti:launch",
+    "EXTENSION_PARAMETERS": {},
+    "TOOL_CONFIG_CACHE_TIMEOUT": 3600,
+    "TOOL_CONFIG_CACHE_VERSION": 1,
+    "CANONICAL_HOST": None,
+}
+LTI_SETUP = SimpleNamespace(**dict(LTI_SETUP_DEFAULTS, **settings.LTI_SETUP))
+INITIALIZE_MODELS = LTI_SETUP.INITIALIZE_MODELS
 VALID_INITIALIZE_MODELS_OPTIONS = (False, "resource_only", "resource_and_course", "resource_and_course_users")
 if not (INITIALIZE_MODELS in VALID_INITIALIZE_MODELS_OPTIONS):
     raise Exception('LTI_SETUP["INITIALIZE_MODELS"] is invalid or missing: must be one of %s' % VALID_INITIALIZE_MODELS_OPTIONS)
 
+# The tool configuration XML only depends on LTI_SETUP, the view class, URL resolution and the requested
+# scheme/host, so it is cached. Bump TOOL_CONFIG_CACHE_VERSION to invalidate after changing LTI_SETUP.
+TOOL_CONFIG_CACHE_TIMEOUT = LTI_SETUP.TOOL_CONFIG_CACHE_TIMEOUT
+TOOL_CONFIG_CACHE_VERSION = LTI_SETUP.TOOL_CONFIG_CACHE_VERSION
+
+INVALID_LAUNCH_CONTENT = b'Invalid LTI launch request.'
+
+# Maps the launch dict keys to the subset of LTI launch parameters used for
+# mapping the tool resource instance to this app's internal course instance.
+LAUNCH_PARAMETERS = (
+    ("consumer_key", "oauth_consumer_key"),
+    ("resource_link_id", "resource_link_id"),
+    ("context_id", "context_id"),
+    ("course_name_short", "context_label"),
+    ("course_name", "context_title"),
+    ("canvas_course_id", "custom_canvas_course_id"),
+)
+
 
 def logout_view(request):
     logout(request)
@@ -28,7 +60,8 @@ def logout_view(request):
 def logged_out_view(request):
     return HttpResponse('Logged out successfully.')
 
-class LTILaunchView(CsrfExemptMixin, LoginRequiredMixin, View):
+@method_decorator(csrf_exempt, name='dispatch')
+class LTILaunchView(LoginRequiredMixin, View):
     """
     This view handles an LTI launch request, which is a POST request that contains
     launch data from the tool consumer.
@@ -49,6 +82,12 @@ class LTILaunchView(CsrfExemptMixin, LoginRequiredMixin, View):
     After the models have been initialized, the view redirects to the appropriate endpoint
     in the django application.
     
+    The resource and course are only written on the first launch of a resource. In the
+    "resource_and_course_users" mode, each user's first launch also creates their course
+    user, which is only updated afterwards when their roles change.
+    Setup stays synchronous because the redirect needs the resource ID and the course user
+    must exist before the user reaches the application.
+    
     To customize the behavior of the launch view, extend or override any of the following "hook"
     methods:
     
@@ -68,8 +107,7 @@ class LTILaunchView(CsrfExemptMixin, LoginRequiredMixin, View):
         
     def get(self, request, *args, **kwargs):
         '''Shows an error message because LTI launch requests must be POSTed.'''
-        content = 'Invalid LTI launch request.'
-        return HttpResponse(content, content_type='text/html', status=200)
+        return HttpResponseNotAllowed(['POST'], INVALID_LAUNCH_CONTENT, content_type='text/html; charset=utf-8')
 
     def post(self, request, *args, **kwargs):
         '''
@@ -110,7 +148,7 @@ class LTILaunchView(CsrfExemptMixin, LoginRequiredMixin, View):
         '''
         Returns a redirect for after the POST request.
         '''
-        launch_redirect_url = LTI_SETUP['LAUNCH_REDIRECT_URL']
+        launch_redirect_url = LTI_SETUP.LAUNCH_REDIRECT_URL
         kwargs = None
         if self.lti_resource is not None:
             kwargs = {"resource_id": self.lti_resource.id}
@@ -123,14 +161,8 @@ class LTILaunchView(CsrfExemptMixin, LoginRequiredMixin, View):
 
         # Collect a subset of the LTI launch parameters for mapping the
         # tool resource instance to this app's internal course instance.
-        launch = {
-            "consumer_key": request.POST.get('oauth_consumer_key', None),
-            "resource_link_id": request.POST.get('resource_link_id', None),
-            "context_id": request.POST.get('context_id', None),
-            "course_name_short": request.POST.get("context_label"),
-            "course_name": request.POST.get("context_title"),
-            "canvas_course_id": request.POST.get('custom_canvas_course_id', None),
-        }
+        post = request.POST.dict()
+        launch = {key: post.get(param) for key, param in LAUNCH_PARAMETERS}
         
         # Lookup tool resource, uniquely identified by the combination of:
         #
@@ -140,23 +172,13 @@ class LTILaunchView(CsrfExemptMixin, LoginRequiredMixin, View):
         # These are required attributes specified by LTI (context ID is not).
         # If no LTI resource is found, automatically setup a new course instance
         # and associate it with the LTI resource.
-        resource_identifiers = [launch[x] for x in ('consumer_key', 'resource_link_id')]
-        if LTIResource.hasResource(*resource_identifiers):
-            lti_resource = LTIResource.getResource(*resource_identifiers)
-        else:
-            create_course = INITIALIZE_MODELS in ("resource_and_course", "resource_and_course_users")
-            lti_resource = LTIResource.setupResource(launch, create_course)
-            if lti_resource.course:
-                request.session['course_id'] = lti_resource.course.id
+        create_course = INITIALIZE_MODELS in ("resource_and_course", "resource_and_course_users")
+        lti_resource = LTIResource.getOrSetupResource(launch, create_course)
         
         # Associate the authenticated user with the course instance.
         if INITIALIZE_MODELS == "resource_and_course_users":
-            launch_roles = request.POST.get('roles', '')
-            if LTICourseUser.hasCourseUser(user=request.user, course=lti_resource.course):
-                lti_course_user = LTICourseUser.getCourseUser(user=request.user, course=lti_resource.course)
-                lti_course_user.updateRoles(launch_roles)
-            else:
-                lti_course_user = LTICourseUser.createCourseUser(user=request.user, course=lti_resource.course, roles=launch_roles)
+            launch_roles = post.get('roles', '')
+            LTICourseUser.getOrCreateCourseUser(user_id=request.user.id, course_id=lti_resource.course_id, roles=launch_roles)
         
         # save a reference to the LTI resource object
         self.lti_resource = lti_resource
@@ -165,7 +187,7 @@ class LTILaunchView(CsrfExemptMixin, LoginRequiredMixin, View):
 
 
 class LTIToolConfigView(View):
-    LAUNCH_URL = LTI_SETUP.get('LAUNCH_URL', 'lti:launch')
+    LAUNCH_URL = LTI_SETUP.LAUNCH_URL
     """
     Outputs LTI configuration XML for Canvas as specified in the IMS Global Common Cartridge Profile.
 
@@ -174,10 +196,13 @@ class LTIToolConfigView(View):
     """
     def get_launch_url(self, request):
         '''
-        Returns the launch URL for the LTI tool. When a secure request is made,
-        a secure launch URL will be supplied.
+        Returns the launch URL for the LTI tool. When LTI_SETUP["CANONICAL_HOST"] is set
+        (e.g. "https://tool.example.edu"), it is used instead of the request's host.
+        Otherwise, a secure launch URL will be supplied when a secure request is made.
         '''
-        if request.is_secure():
+        if LTI_SETUP.CANONICAL_HOST:
+            host = LTI_SETUP.CANONICAL_HOST
+        elif request.is_secure():
             host = 'https://' + request.get_host()
         else:
             host = 'http://' + request.get_host()
@@ -201,10 +226,8 @@ class LTIToolConfigView(View):
             }
         }
         '''
-        EXT_PARAMS = LTI_SETUP.get("EXTENSION_PARAMETERS", {})
-        for ext_key in EXT_PARAMS:
-            for ext_param in EXT_PARAMS[ext_key]:
-                ext_value = EXT_PARAMS[ext_key][ext_param]
+        for ext_key, ext_params in LTI_SETUP.EXTENSION_PARAMETERS.items():
+            for ext_param, ext_value in ext_params.items():
                 lti_tool_config.set_ext_param(ext_key, ext_param, ext_value)
 
     def get_tool_config(self, request):
@@ -213,19 +236,57 @@ class LTIToolConfigView(View):
         '''
         launch_url = self.get_launch_url(request)
         return ToolConfig(
-            title=LTI_SETUP['TOOL_TITLE'],
-            description=LTI_SETUP['TOOL_DESCRIPTION'],
+            title=LTI_SETUP.TOOL_TITLE,
+            description=LTI_SETUP.TOOL_DESCRIPTION,
             launch_url=launch_url,
             secure_launch_url=launch_url,
         )
 
-    def get(self, request, *args, **kwargs):
+    def get_tool_config_xml(self, request):
         '''
-        Returns the LTI tool configuration as XML.
+        Returns the LTI tool configuration serialized as XML.
+
+        The XML is rendered from a string template unless a subclass customizes
+        get_tool_config() or set_ext_params(), in which case the ToolConfig()
+        instance is serialized instead.
         '''
+        # Extensions are rendered here rather than at import so that an invalid value
+        # in EXTENSION_PARAMETERS only breaks this view; the XML is cached by get().
+        cls = type(self)
+        if cls.get_tool_config is LTIToolConfigView.get_tool_config and cls.set_ext_params is LTIToolConfigView.set_ext_params:
+            return render_tool_config(
+                title=LTI_SETUP.TOOL_TITLE,
+                description=LTI_SETUP.TOOL_DESCRIPTION,
+                launch_url=self.get_launch_url(request),
+                extensions=render_extensions(LTI_SETUP.EXTENSION_PARAMETERS),
+            )
         lti_tool_config = self.get_tool_config(request)
         self.set_ext_params(lti_tool_config)
-        return HttpResponse(lti_tool_config.to_xml(), content_type='text/xml', status=200)
+        return lti_tool_config.to_xml()
+
+    def get_cache_key(self, request):
+        '''
+        Returns the cache key for the tool configuration XML, which varies by view
+        class, launch URL name, script prefix and urlconf (which affect reverse()),
+        scheme and host (unless the host is pinned by CANONICAL_HOST).
+        '''
+        view = '%s.%s' % (type(self).__module__, type(self).__qualname__)
+        urls = '%s:%s:%s' % (self.LAUNCH_URL, get_script_prefix(), getattr(request, 'urlconf', None))
+        if LTI_SETUP.CANONICAL_HOST:
+            return 'lti:toolconfig:%s:%s:canonical' % (view, urls)
+        return 'lti:toolconfig:%s:%s:%d:%s' % (view, urls, request.is_secure(), request.get_host())
+
+    def get(self, request, *args, **kwargs):
+        '''
+        Returns the LTI tool configuration as XML.
+        '''
+        xml = cache.get_or_set(
+            self.get_cache_key(request),
+            lambda: self.get_tool_config_xml(request),
+            TOOL_CONFIG_CACHE_TIMEOUT,
+            version=TOOL_CONFIG_CACHE_VERSION,
+        )
+        return HttpResponse(xml, content_type='text/xml', status=200)
 
     def _url(self, url):
         '''
@@ -74,7 +74,6 @@ setup(
         install_requires=[
             'Django>=2.0', 
             'lti', 
-            'django-braces',
             'future'
         ],
 